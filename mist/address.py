@@ -11,31 +11,29 @@
 IP address and network utilities
 """
 
+from functools import lru_cache
 from ipaddress import IPv4Address, IPv4Network
 
 
-def get_network(address: str, netmask: str) -> IPv4Network:
+@lru_cache(maxsize=4096)
+def ip_to_int(address: str) -> int:
     """
-    Get the network object from a given address and netmask
+    Get the integer value of a given IP address
 
     :param str address: A string representing the IP address in dotted decimal format
-    :param str netmask: A string representing the subnet mask in dotted decimal format
-    :return IPv4Network: An IPv4Network object
+    :return int: The IP address as an unsigned 32-bit integer
+    :raises ValueError: If the address is not a valid dotted decimal IPv4 address
     """
-    net = IPv4Network(f"{address}/{netmask}", strict=False)
-    return net
+    return int(IPv4Address(address))
 
 
-def check_network_contains_ip(network: IPv4Network, address: str) -> bool:
+@lru_cache(maxsize=4096)
+def netmask_to_int(netmask: str) -> int:
     """
-    Check if a given IP address is within a given network
+    Get the integer value of a given subnet mask
 
-    :param IPv4Network network: The network to check if it contains the provided address
-    :param str address: A string representing the IP address in dotted decimal format
-    :return bool: A boolean value whether or not the address is in the network
+    :param str netmask: A string representing the subnet mask in dotted decimal format or as a prefix length
+    :return int: The subnet mask as an unsigned 32-bit integer
+    :raises ValueError: If the netmask is not a contiguous subnet mask or a valid prefix length
     """
-    ip = IPv4Address(address)
-    if ip in network:
-        return True
-    else:
-        return False
+    return int(IPv4Network(f"0.0.0.0/{netmask}").netmask)
@@ -12,19 +12,33 @@ Mist API class definition for interacting with the Mist cloud
 """
 
 from typing import Dict, List, Union
-from http.client import HTTPSConnection
+from http.client import HTTPSConnection, HTTPException
 import json
+import threading
+import time
 from .logger import logger, TextColors
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class API:
     """
     Mist API class definition for interacting with the Mist cloud
     """
 
+    __slots__ = ('org_id', 'token', '_idle', '_lock', '_cache')
+
     org_id: str
     token: str
 
+    timeout: int = 30
+    pool_size: int = 20
+    cache_ttl: int = 60
+    cache_size: int = 256
+
     def __init__(self, org_id: str, token: str):
         """
         Initialize the API object
@@ -34,6 +48,76 @@ class API:
         """
         self.org_id = org_id
         self.token = token
+        self._idle = dict()
+        self._lock = threading.Lock()
+        self._cache = dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Close all of the idle persistent connections opened by this API object
+        """
+        with self._lock:
+            for connections in self._idle.values():
+                for conn in connections:
+                    conn.close()
+            self._idle.clear()
+
+    def _acquire_connection(self, host: str) -> HTTPSConnection:
+        """
+        Take an idle keep-alive connection to a given host from the pool, opening a new one if none are available
+
+        :param str host: The host FQDN or IP (e.g. api.mist.com)
+        :return HTTPSConnection: A keep-alive connection to the host
+        """
+        with self._lock:
+            connections = self._idle.get(host)
+            if connections:
+                return connections.pop()
+        return HTTPSConnection(host=host, timeout=self.timeout)
+
+    def _release_connection(self, host: str, conn: HTTPSConnection):
+        """
+        Return a connection to the idle pool so that it can be reused by any thread, closing it if the pool is full
+
+        :param str host: The host FQDN or IP (e.g. api.mist.com)
+        :param HTTPSConnection conn: The connection to return
+        """
+        with self._lock:
+            connections = self._idle.setdefault(host, list())
+            if len(connections) < self.pool_size:
+                connections.append(conn)
+                return
+        conn.close()
+
+    def _request(self, host: str, endpoint: str) -> bytes:
+        """
+        Send a GET request over a pooled connection, reconnecting once if the server dropped it
+
+        :param str host: The host FQDN or IP (e.g. api.mist.com)
+        :param str endpoint: The API endpoint located at the host (e.g. /api/v1/self)
+        :return bytes: The raw response body
+        """
+        conn = self._acquire_connection(host=host)
+        try:
+            try:
+                conn.request(method="GET", url=endpoint, headers=self.headers)
+                res = conn.getresponse()
+            except (HTTPException, ConnectionError):
+                conn.close()
+                conn.request(method="GET", url=endpoint, headers=self.headers)
+                res = conn.getresponse()
+            body = res.read()
+        except Exception:
+            conn.close()
+            raise
+        self._release_connection(host=host, conn=conn)
+        return body
 
     @property
     def headers(self) -> Dict:
@@ -52,24 +136,37 @@ class API:
             raise e
         return h
 
-    def get(self, host: str, endpoint: str) -> Union[Dict, List]:
+    def get(self, host: str, endpoint: str, use_cache: bool = False) -> Union[Dict, List]:
         """
         Process an HTTPS request to a given host and endpoint
 
         :param str host: The host FQDN or IP (e.g. api.mist.com)
         :param str endpoint: The API endpoint located at the host (e.g. /api/v1/self)
+        :param bool use_cache: Return a cached response if the same endpoint was requested within the cache TTL
         :return Union[Dict,List]: A dictionary or list containing the JSON response data
         """
+        key = (host, endpoint)
+        if use_cache:
+            now = time.monotonic()
+            cached = self._cache.get(key)
+            if cached and cached[0] > now:
+                return cached[1]
+            with self._lock:
+                for expired in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+                    del self._cache[expired]
         try:
-            conn = HTTPSConnection(host=host)
-            conn.request(method="GET", url=endpoint, headers=self.headers)
-            res = conn.getresponse()
+            body = self._request(host=host, endpoint=endpoint)
         except Exception as e:
             logger.error(f"{TextColors.FAIL}Error getting data from '{TextColors.WARNING}{host}{TextColors.FAIL}' at '{TextColors.WARNING}{endpoint}{TextColors.FAIL}'{TextColors.ENDC}")
             raise e
         try:
-            response = json.loads(res.read().decode())
+            response = orjson.loads(body) if orjson else json.loads(body)
         except Exception as e:
             logger.error(f"{TextColors.FAIL}Error parsing JSON response:{TextColors.ENDC} {e}")
             raise e
+        if use_cache:
+            with self._lock:
+                if key not in self._cache and len(self._cache) >= self.cache_size:
+                    del self._cache[next(iter(self._cache))]
+                self._cache[key] = (time.monotonic() + self.cache_ttl, response)
         return response
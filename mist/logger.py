@@ -15,16 +15,21 @@ import logging
 import sys
 
 
+_COLOR = sys.stdout is not None and sys.stdout.isatty()
+
+
 class TextColors:
     """
-    A simple mapping of colors for colorizing text output
+    A simple mapping of colors for colorizing text output, colors are disabled when stdout is not a terminal
     """
-    OK = '\033[92m'
-    WARNING = '\033[93m'
-    FAIL = '\033[91m'
-    ENDC = '\033[0m'
-    BOLD = '\033[1m'
-    UNDERLINE = '\033[4m'
+    __slots__ = ()
+
+    OK = '\033[92m' if _COLOR else ''
+    WARNING = '\033[93m' if _COLOR else ''
+    FAIL = '\033[91m' if _COLOR else ''
+    ENDC = '\033[0m' if _COLOR else ''
+    BOLD = '\033[1m' if _COLOR else ''
+    UNDERLINE = '\033[4m' if _COLOR else ''
 
 
 logging.basicConfig(stream=sys.stdout, format="[%(levelname)s] -- %(message)s", level=logging.INFO)
@@ -11,10 +11,123 @@
 Organization definition and methods for evaluating the switches within an organization
 """
 
-from typing import List
+from typing import List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
 from .api import API
 from .logger import logger, TextColors
-from .address import get_network, check_network_contains_ip
+from .address import ip_to_int, netmask_to_int
+
+_HEADING = f"{TextColors.BOLD}{TextColors.UNDERLINE}"
+_HEADER = (f"\n{_HEADING}{'Name':^24}{TextColors.ENDC} {_HEADING}{'MAC':^18}{TextColors.ENDC} {_HEADING}{'Network':^20}{TextColors.ENDC} "
+           f"{_HEADING}{'VLAN':^6}{TextColors.ENDC} {_HEADING}{'Result':^8}{TextColors.ENDC} {_HEADING}{'Additional Info':^90}{TextColors.ENDC}\n")
+_ROW = (f"{TextColors.BOLD}{{name:<24.23}}{TextColors.ENDC} {{mac_str:<18}} {{network:<20}} {{vlan:<6}} "
+        f"{{color}}{{result:<8}}{TextColors.ENDC} {{reason:<90}}\n").format
+
+
+# Switch check result codes
+_PASS, _IP_MISMATCH, _GATEWAY_MISMATCH, _IP_GATEWAY_MISMATCH, _OFF_NETWORK, _VLAN_MISMATCH = range(6)
+_REASONS = {
+    _PASS:                "None",
+    _IP_MISMATCH:         f"{TextColors.WARNING}Management Interface IP Mis-match{TextColors.ENDC}",
+    _GATEWAY_MISMATCH:    f"{TextColors.WARNING}Management Interface Gateway Mis-match{TextColors.ENDC}",
+    _IP_GATEWAY_MISMATCH: f"{TextColors.WARNING}Management Interface IP/Gateway Mis-match{TextColors.ENDC}",
+    _OFF_NETWORK:         f"{TextColors.WARNING}Management Interface IP/Gateway Missing or Dynamic{TextColors.ENDC}",
+    _VLAN_MISMATCH:       f"{TextColors.WARNING}Management Interface VLAN Incorrect: Configured as VLAN {{configured}} but is actually using VLAN {{actual}}{TextColors.ENDC}",
+}
+
+
+def _classify(ip_match: bool, gateway_match: bool, gateway_on_net: bool, vlan_match: bool) -> int:
+    """
+    Classify the result of a switch check, the VLAN is only reported once the IP/gateway checks have failed
+
+    :param bool ip_match: Whether the configured and actual IP addresses match
+    :param bool gateway_match: Whether the configured and actual gateways match
+    :param bool gateway_on_net: Whether the configured gateway is within the configured network
+    :param bool vlan_match: Whether the configured and actual VLANs match
+    :return int: The result code of the check
+    """
+    if ip_match and gateway_match and gateway_on_net:
+        return _PASS
+    if not vlan_match:
+        return _VLAN_MISMATCH
+    if not gateway_on_net:
+        return _OFF_NETWORK
+    if ip_match:
+        return _GATEWAY_MISMATCH
+    if gateway_match:
+        return _IP_MISMATCH
+    return _IP_GATEWAY_MISMATCH
+
+
+def _fmt_mac(mac: str) -> str:
+    """
+    Format a bare MAC address string (e.g. 'aabbccddeeff') as 'AA:BB:CC:DD:EE:FF'
+
+    :param str mac: The MAC address without separators
+    :return str: The upper-case, colon separated MAC address
+    """
+    mac = mac.upper()
+    return ':'.join(mac[i:i + 2] for i in range(0, len(mac), 2))
+
+
+def _normalize_vlan(vlan: Union[int, str]) -> Union[int, str]:
+    """
+    Normalize a VLAN from either the switch stats (e.g. 'vlan10') or a network template (e.g. 10 or '10') so that
+    both sides of the VLAN check compare equal
+
+    :param Union[int,str] vlan: The VLAN id or interface name
+    :return Union[int,str]: The VLAN id as an int, or the original string if it is not numeric
+    """
+    vlan = str(vlan).strip().removeprefix('vlan')
+    return int(vlan) if vlan.isdigit() else vlan
+
+
+def _to_int_or_none(convert, value: str) -> Optional[int]:
+    """
+    Convert an address or netmask string to its integer value, or None if it is missing or invalid
+
+    :param convert: The conversion function, either ip_to_int or netmask_to_int
+    :param str value: A string representing the IP address or netmask
+    :return int: The value as an unsigned 32-bit integer, or None
+    """
+    try:
+        return convert(value) if value else None
+    except (ValueError, TypeError):
+        return None
+
+
+def _check_switches_rows(switches: list) -> list:
+    """
+    Check a list of switches against their Mist cloud config and format their results table rows
+
+    :param list switches: A list containing the switch objects to check
+    :return list: One (checks, row) tuple per switch, where checks is a dictionary of the individual check results that
+                  is merged back into the switch object and row is the formatted results table row
+    """
+    OK, FAIL, WARN, ENDC = TextColors.OK, TextColors.FAIL, TextColors.WARNING, TextColors.ENDC
+    checked = list()
+    for switch in switches:
+        checks = dict()
+        try:
+            checks['ip_match'] = (switch['ip_config']['ip'] == switch['ip_actual']['ip']) if 'ip' in switch['ip_config'] else False
+            checks['netmask_match'] = (switch['ip_config']['netmask'] == switch['ip_actual']['netmask']) if 'netmask' in switch['ip_config'] else False
+            checks['gateway_match'] = (switch['ip_config']['gateway'] == switch['ip_actual']['gateway']) if 'gateway' in switch['ip_config'] else False
+            checks['vlan_match'] = (switch['ip_config']['vlan'] == switch['ip_actual']['vlan'])
+
+            if switch['ip_int'] is not None and switch['mask_int'] is not None and switch['gateway_int'] is not None:
+                checks['gateway_on_net'] = (switch['gateway_int'] & switch['mask_int']) == (switch['ip_int'] & switch['mask_int'])
+            else:
+                checks['gateway_on_net'] = False
+            code = _classify(ip_match=checks['ip_match'], gateway_match=checks['gateway_match'],
+                             gateway_on_net=checks['gateway_on_net'], vlan_match=checks['vlan_match'])
+            result = "PASS" if code == _PASS else "FAIL"
+            reason = _REASONS[code].format(configured=switch['ip_config']['vlan'], actual=switch['ip_actual']['vlan'])
+            checked.append((checks, _ROW(name=switch['name'], mac_str=switch['mac_str'], network=switch['ip_config']['network'], vlan=switch['ip_config']['vlan'],
+                                         color=OK if code == _PASS else FAIL, result=result, reason=reason)))
+        except Exception as e:
+            logger.error(f"{FAIL}Error processing device details:{ENDC} {switch['name']}")
+            checked.append((checks, f"{switch['name']:<24} {switch['mac_str']:<18} {WARN}Error processing device:{ENDC} {e}\n"))
+    return checked
 
 
 # noinspection PyTypeChecker
@@ -23,119 +136,165 @@ class Org:
     Organization definition and methods for evaluating the switches within an organization
     """
 
-    oid: str = ""
-    token: str = ""
-    api: API = None
-    host: str = "api.mist.com"
-    sites: list = list()
-    network_templates: list = list()
-    switches: list = list()
+    __slots__ = ('oid', 'token', 'api', 'host', 'sites', 'network_templates', 'switches', '_nt_by_id', '_site_net_vlan')
+
+    oid: str
+    token: str
+    api: API
+    host: str
+    sites: list
+    network_templates: list
+    switches: list
+    _nt_by_id: dict
+    _site_net_vlan: dict
+
+    max_workers: int = 20
 
-    def __init__(self, org_id: str, token: str, site_list: list = None):
+    def __init__(self, org_id: str, token: str, site_list: list = None, switch_list: list = None):
         """
         Initialize the Org object
 
         :param str org_id: Mist organization identifier string
         :param str token: Mist API authentication token
+        :param list site_list: A list containing the name of the sites to load, if None all sites will be loaded
+        :param list switch_list: A list of MAC addresses to load, if None all switches will be loaded
         """
         self.oid = org_id
         self.token = token
         self.api = API(org_id=org_id, token=token)
+        self.host = "api.mist.com"
 
-        logger.debug("Loading sites...")
-        self.sites = list()
-        self.load_sites(site_list=site_list)
-        logger.debug(f"Loaded {len(self.sites)} sites.")
+        try:
+            logger.debug("Loading sites and network templates from organization...")
+            self.sites = list()
+            self.network_templates = list()
+            self._nt_by_id = dict()
+            self._site_net_vlan = dict()
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                sites_future = executor.submit(self.load_sites, site_list=site_list)
+                network_templates_future = executor.submit(self.load_network_templates)
+                sites_future.result()
+                network_templates_future.result()
+            logger.debug("Loaded %d sites.", len(self.sites))
+            logger.debug("Loaded %d network templates.", len(self.network_templates))
+
+            logger.debug("Matching and assigning network template data to sites...")
+            self.match_network_template_to_site()
+            logger.debug("Finished network template data correlation.")
 
-        logger.debug("Loading network templates from organization...")
-        self.network_templates = list()
-        self.load_network_templates()
-        logger.debug(f"Loaded {len(self.network_templates)} network templates.")
+            logger.debug("Loading switches...")
+            self.switches = list()
+            self.load_switches(switch_list=switch_list)
+            logger.debug("Loaded %d switches.", len(self.switches))
+        except Exception:
+            self.api.close()
+            raise
 
-        logger.debug("Matching and assigning network template data to sites...")
-        self.match_network_template_to_site()
-        logger.debug("Finished network template data correlation.")
+    def __enter__(self):
+        return self
 
-        logger.debug("Loading switches...")
-        self.switches = list()
-        self.load_switches()
-        logger.debug(f"Loaded {len(self.switches)} switches.")
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.api.close()
 
     #### INITIAL LOADING METHODS ####
 
     def load_sites(self, site_list: list = None):
         """
-        Get the organization sites, if a list of names is not provided then all sites will be loaded
+        Get the organization sites, if a list of names is not provided then all sites will be loaded. Site names are
+        matched ignoring case and surrounding whitespace.
 
         :param list site_list: A list containing the name of the sites to load
         """
         try:
-            sites = self.api.get(host=self.host, endpoint=f"/api/v1/orgs/{self.oid}/sites")
+            sites = self.api.get(host=self.host, endpoint=f"/api/v1/orgs/{self.oid}/sites", use_cache=True)
         except Exception as e:
             logger.error(f"{TextColors.FAIL}Error getting org sites:{TextColors.ENDC} {e}")
             raise e
         if site_list:
-            sites = [s for s in sites if s['name'] in site_list]
-        self.sites = sites
+            wanted_sites = {name.strip().casefold() for name in site_list}
+            sites = [s for s in sites if s['name'].strip().casefold() in wanted_sites]
+        # Copy the site objects since they are extended with their network template and may be a cached API response
+        self.sites = [dict(s) for s in sites]
 
     def load_network_templates(self) -> List:
         """
         Get the network templates for the organization
         """
         try:
-            network_templates = self.api.get(host=self.host, endpoint=f"/api/v1/orgs/{self.oid}/networktemplates")
+            network_templates = self.api.get(host=self.host, endpoint=f"/api/v1/orgs/{self.oid}/networktemplates", use_cache=True)
         except Exception as e:
             logger.error(f"{TextColors.FAIL}Error getting network templates:{TextColors.ENDC} {e}")
             raise e
         self.network_templates = network_templates
+        self._nt_by_id = {nt['id']: nt for nt in network_templates}
 
     def match_network_template_to_site(self):
         """
-        Align sites with their respective network templates and add the contents of the template to the site object
+        Align sites with their respective network templates and add the contents of the template to the site object,
+        then build the (site id, network name) to VLAN id lookup used when loading the switches
         """
         for site in self.sites:
-            if 'networktemplate_id' in site and site['networktemplate_id']:
-                matched_network_template = [nt for nt in self.network_templates if nt['id'] == site['networktemplate_id']]
-                if len(matched_network_template) >= 1:
-                    site['network_template'] = matched_network_template[0]
+            network_template = self._nt_by_id.get(site.get('networktemplate_id'))
+            if network_template:
+                site['network_template'] = network_template
+        self._site_net_vlan = {(site['id'], name): network['vlan_id']
+                               for site in self.sites if 'network_template' in site
+                               for name, network in site['network_template'].get('networks', dict()).items()}
 
-    def load_switches(self):
+    def load_switches(self, switch_list: list = None):
         """
-        Load the organization switches from the Mist API
+        Load the organization switches from the Mist API, the stats for each site are requested concurrently
+
+        :param list switch_list: A list of MAC addresses to load, if None all switches will be loaded
         """
-        new_switches = list()
-        for site in self.sites:
-            switches = self.get_switches_stats(site_id=site['id'])
-            for switch in switches:
-                if len(switch['name']) < 1:
-                    switch['name'] = ':'.join([switch['mac'][i:i + 2].upper() for i in range(0, len(switch['mac']), 2)])
-                new_switch = {
-                    "name":      switch['name'],
-                    "site":      site['name'],
-                    "site_id":   site['id'],
-                    "device_id": switch['id'],
-                    "mac":       switch['mac'],
-                    "mac_str":   ':'.join([switch['mac'][i:i + 2].upper() for i in range(0, len(switch['mac']), 2)]),
-                    "ip_config": switch['ip_config'],
-                    "ip_actual": switch['ip_stat'],
-                    "net_obj": get_network(address=switch['ip_config']['ip'], netmask=switch['ip_config']['netmask']) if 'ip' in switch['ip_config'] else None
-                }
-                for vlan, addr in new_switch['ip_actual']['ips'].items():
-                    if new_switch['ip_actual']['ip'] == addr:
-                        new_switch['ip_actual']['vlan'] = vlan.strip('vlan')
+        self.switches = list(self._iter_switches_for_sites(sites=self.sites, switch_list=switch_list))
+
+    def _iter_switches_for_sites(self, sites: list, switch_list: list = None):
+        """
+        Generate the switch objects for the given sites, only building the switches that were requested. Each site is
+        only requested once even if it appears multiple times in the list.
+
+        :param list sites: A list containing the site objects to load the switches from
+        :param list switch_list: A list of MAC addresses to load, if None all switches will be loaded
+        :return: A generator yielding one switch dictionary per switch
+        """
+        wanted_macs = set(switch_list) if switch_list else None
+        sites_by_id = {site['id']: site for site in sites}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            site_stats = executor.map(lambda site_id: self.get_switches_stats(site_id=site_id), sites_by_id)
+            for site, switches in zip(sites_by_id.values(), site_stats):
+                for switch in switches:
+                    if wanted_macs is not None and switch['mac'] not in wanted_macs:
+                        continue
+                    mac_str = _fmt_mac(switch['mac'])
+                    new_switch = {
+                        "name":      switch['name'] or mac_str,
+                        "site":      site['name'],
+                        "site_id":   site['id'],
+                        "device_id": switch['id'],
+                        "mac":       switch['mac'],
+                        "mac_str":   mac_str,
+                        "ip_config": dict(switch['ip_config']),
+                        "ip_actual": dict(switch['ip_stat']),
+                        "ip_int": _to_int_or_none(ip_to_int, switch['ip_config'].get('ip')),
+                        "mask_int": _to_int_or_none(netmask_to_int, switch['ip_config'].get('netmask')),
+                        "gateway_int": _to_int_or_none(ip_to_int, switch['ip_config'].get('gateway'))
+                    }
+                    ip_to_vlan = {addr: vlan for vlan, addr in new_switch['ip_actual']['ips'].items()}
+                    vlan_key = ip_to_vlan.get(new_switch['ip_actual']['ip'])
+                    if vlan_key:
+                        new_switch['ip_actual']['vlan'] = _normalize_vlan(vlan_key)
                     else:
                         new_switch['ip_actual']['vlan'] = 0
-                if new_switch['ip_config']['network'] and new_switch['ip_config']['network'] != "default":
-                    new_switch['ip_config']['vlan'] = site['network_template']['networks'][new_switch['ip_config']['network']]['vlan_id']
-                    logger.debug(f"Matched {new_switch['name']} management network '{new_switch['ip_config']['network']}' to VLAN {new_switch['ip_config']['vlan']}")
-                elif new_switch['ip_config']['network'] and new_switch['ip_config']['network'] == "default":
-                    new_switch['ip_config']['vlan'] = 1
-                    logger.debug(f"Matched {new_switch['name']} management network '{new_switch['ip_config']['network']}' to VLAN {new_switch['ip_config']['vlan']}")
-                else:
-                    new_switch['ip_config']['vlan'] = 0
-                    logger.error(f"Did not match {new_switch['name']} management network '{new_switch['ip_config']['network']}' to VLAN {new_switch['ip_config']['vlan']}")
-                new_switches.append(new_switch)
-        self.switches = new_switches
+                    network = new_switch['ip_config']['network']
+                    vlan_id = 1 if network == "default" else self._site_net_vlan.get((site['id'], network))
+                    if network and vlan_id is not None:
+                        new_switch['ip_config']['vlan'] = _normalize_vlan(vlan_id)
+                        logger.debug("Matched %s management network '%s' to VLAN %s", new_switch['name'], network, new_switch['ip_config']['vlan'])
+                    else:
+                        new_switch['ip_config']['vlan'] = 0
+                        logger.error(f"Did not match {new_switch['name']} management network '{network}' to VLAN {new_switch['ip_config']['vlan']}")
+                    yield new_switch
 
     #### STATS RETRIEVAL METHODS ####
 
@@ -147,7 +306,7 @@ class Org:
         :return list: A list containing the stats and config of all switches at a given site
         """
         try:
-            stats = self.api.get(host=self.host, endpoint=f"/api/v1/sites/{site_id}/stats/devices?type=switch")
+            stats = self.api.get(host=self.host, endpoint=f"/api/v1/sites/{site_id}/stats/devices?type=switch", use_cache=True)
         except Exception as e:
             logger.error(f"{TextColors.FAIL}Error getting switch stats:{TextColors.ENDC} {e}")
             raise e
@@ -178,44 +337,16 @@ class Org:
         :return str: A string containing a table of output for displaying the results of the check
         """
         if switch_list:
-            switches = [s for s in self.switches for x in switch_list if s['mac'] == x]
+            wanted = set(switch_list)
+            switches = [s for s in self.switches if s['mac'] in wanted]
         else:
             switches = self.switches
-        switch_output = f"\n{TextColors.BOLD}{TextColors.UNDERLINE}{'Name':^24}{TextColors.ENDC} {TextColors.BOLD}{TextColors.UNDERLINE}{'MAC':^18}{TextColors.ENDC} {TextColors.BOLD}{TextColors.UNDERLINE}{'Network':^20}{TextColors.ENDC} {TextColors.BOLD}{TextColors.UNDERLINE}{'VLAN':^6}{TextColors.ENDC} {TextColors.BOLD}{TextColors.UNDERLINE}{'Result':^8}{TextColors.ENDC} {TextColors.BOLD}{TextColors.UNDERLINE}{'Additional Info':^90}{TextColors.ENDC}\n"
-        for switch in switches:
-            try:
-                switch['ip_match'] = (switch['ip_config']['ip'] == switch['ip_actual']['ip']) if 'ip' in switch['ip_config'] else False
-                switch['netmask_match'] = (switch['ip_config']['netmask'] == switch['ip_actual']['netmask']) if 'netmask' in switch['ip_config'] else False
-                switch['gateway_match'] = (switch['ip_config']['gateway'] == switch['ip_actual']['gateway']) if 'gateway' in switch['ip_config'] else False
-                switch['vlan_match'] = (switch['ip_config']['vlan'] == switch['ip_actual']['vlan'])
-
-                if switch['net_obj']:
-                    switch['gateway_on_net'] = check_network_contains_ip(network=switch['net_obj'], address=switch['ip_config']['gateway'])
-                else:
-                    switch['gateway_on_net'] = False
-                if switch['ip_match'] and switch['gateway_match'] and switch['gateway_on_net']:  # and switch['vlan_match']:
-                    result = "PASS"
-                    reason = "None"
-                else:
-                    result = "FAIL"
-                    if not switch['ip_match'] and switch['gateway_match']:
-                        reason = f"{TextColors.WARNING}Management Interface IP Mis-match{TextColors.ENDC}"
-                    elif switch['ip_match'] and not switch['gateway_match']:
-                        reason = f"{TextColors.WARNING}Management Interface Gateway Mis-match{TextColors.ENDC}"
-                    elif not switch['ip_match'] and not switch['gateway_match']:
-                        reason = f"{TextColors.WARNING}Management Interface IP/Gateway Mis-match{TextColors.ENDC}"
-                    else:
-                        reason = f"{TextColors.WARNING}Unknown failure{TextColors.ENDC}"
-                    if not switch['gateway_on_net']:
-                        reason = f"{TextColors.WARNING}Management Interface IP/Gateway Missing or Dynamic{TextColors.ENDC}"
-                    if not switch['vlan_match']:
-                        reason = f"{TextColors.WARNING}Management Interface VLAN Incorrect: Configured as VLAN {switch['ip_config']['vlan']} but is actually using VLAN {switch['ip_actual']['vlan']}{TextColors.ENDC}"
-                switch_output = f"{switch_output}{TextColors.BOLD}{switch['name']:<24.23}{TextColors.ENDC} {switch['mac_str']:<18} {switch['ip_config']['network']:<20} {switch['ip_config']['vlan']:<6} {TextColors.OK if result == 'PASS' else TextColors.FAIL}{result:<8}{TextColors.ENDC} {reason:<90}\n"
-            except Exception as e:
-                logger.error(f"{TextColors.FAIL}Error processing device details:{TextColors.ENDC} {switch['name']}")
-                switch_output = f"{switch_output}{switch['name']:<24} {switch['mac_str']:<18} {TextColors.WARNING}Error processing device:{TextColors.ENDC} {e}\n"
-                continue
-        return switch_output
+        checked = _check_switches_rows(switches)
+        switch_output = [_HEADER]
+        for switch, (checks, row) in zip(switches, checked):
+            switch.update(checks)
+            switch_output.append(row)
+        return ''.join(switch_output)
 
     #### DATA EXPORT METHODS ####
 
@@ -228,5 +359,5 @@ class Org:
         """
         if csv_file and len(self.switches) >= 1:
             # TODO: Output to CSV
-            logger.debug(f"Exporting switch validation results to: {csv_file}")
+            logger.debug("Exporting switch validation results to: %s", csv_file)
             pass
@@ -46,8 +46,8 @@ that connectivity will remain after moving to a managed configuration.
 import sys
 import argparse
 from mist import logger, Org
-from logging import DEBUG, ERROR
-from csv import DictReader
+from logging import DEBUG, INFO, ERROR
+import csv
 
 
 def process_csv(csvfile: str) -> (list, list):
@@ -57,27 +57,35 @@ def process_csv(csvfile: str) -> (list, list):
     :param str csvfile: String representation of the CSV location (relative or absolute)
     :return (list, list): Lists containing the sites and switch MAC addresses
     """
-    csv_data = list()
     try:
         with open(csvfile, 'r') as csv_stream:
-            reader = DictReader(csv_stream)
+            reader = csv.reader(csv_stream)
+            header = next(reader, None)
+            if not header:
+                logger.warning(f"CSV file '{csvfile}' not loaded, file is empty.")
+                return None, None
+            missing = [c for c in ('mac_address', 'site_name') if c not in header]
+            if missing:
+                raise ValueError(f"CSV file '{csvfile}' is missing required column(s): {', '.join(missing)}")
+            mac_idx = header.index('mac_address')
+            site_idx = header.index('site_name')
+            switches = set()
+            sites = set()
             for row in reader:
-                csv_data.append(row)
+                if not row:
+                    continue
+                if len(row) <= max(mac_idx, site_idx):
+                    logger.warning(f"CSV file '{csvfile}' line {reader.line_num} skipped, missing the mac_address or site_name value.")
+                    continue
+                switches.add(row[mac_idx].replace(":", "").lower())
+                sites.add(row[site_idx])
     except FileNotFoundError:
         logger.warning(f"CSV file '{csvfile}' not loaded, file not found.")
         return None, None
     except Exception as exc:
         raise exc
-    try:
-        for switch in csv_data:
-            switch['mac'] = switch['mac_address'].replace(":", "").lower()
-            del switch['mac_address']
-            switch['site'] = switch['site_name']
-            del switch['site_name']
-    except Exception as exc:
-        raise exc
-    switch_list = list({s['mac'] for s in csv_data})
-    site_list = list({s['site'] for s in csv_data})
+    switch_list = list(switches)
+    site_list = list(sites)
     return site_list, switch_list
 
 
@@ -193,18 +201,20 @@ def parse() -> argparse.Namespace:
 
 def main():
     args = parse()
-    logger.info(f"ARGS: {args}")
-    org = Org(org_id=args.org, token=args.token, site_list=args.sites)
-    logger.info(f"SITES: {len(org.sites)}")
-    logger.info(f"SITE NAMES: {[(s['name'],s['id']) for s in org.sites]}")
-    logger.info(f"SWITCHES: {len(org.switches)}")
-    logger.info(f"SWITCHES: {[(s['name'],s['device_id']) for s in org.switches]}")
-    if args.switches:
-        switch_check_output = org.check_switches(switch_list=args.switches)
-    else:
-        switch_check_output = org.check_switches()
-    if args.export:
-        org.export_switches(csv_file=args.outfile)
+    logger.info("ARGS: %s", args)
+    with Org(org_id=args.org, token=args.token, site_list=args.sites, switch_list=args.switches) as org:
+        logger.info("SITES: %d", len(org.sites))
+        if logger.isEnabledFor(INFO):
+            logger.info("SITE NAMES: %s", [(s['name'], s['id']) for s in org.sites])
+        logger.info("SWITCHES: %d", len(org.switches))
+        if logger.isEnabledFor(INFO):
+            logger.info("SWITCHES: %s", [(s['name'], s['device_id']) for s in org.switches])
+        if args.switches:
+            switch_check_output = org.check_switches(switch_list=args.switches)
+        else:
+            switch_check_output = org.check_switches()
+        if args.export:
+            org.export_switches(csv_file=args.outfile)
     if not args.hide:
         print(switch_check_output)
 